@@ -0,0 +1,823 @@
+#!/usr/bin/env python3
+"""Annotate training examples with reasoning traces.
+
+Sends each training example to Claude and asks for a short reasoning
+trace explaining why the expected response is the right one.  Annotated
+examples are appended to ``training_with_thinking.jsonl`` in the data
+directory and picked up by train_lora.py.
+
+Usage:
+    python annotate_thinking.py --data-dir ../data              # concurrent annotation
+    python annotate_thinking.py --data-dir ../data --submit     # submit a Batch API job
+    python annotate_thinking.py --data-dir ../data --status     # poll the batch
+    python annotate_thinking.py --data-dir ../data --process    # download batch results
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import itertools
+import mmap
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import anthropic
+import numpy as np
+import orjson
+from aiolimiter import AsyncLimiter
+from tqdm import tqdm
+
+try:
+    import simdjson
+except ImportError:  # SIMD parser is optional; orjson path still works
+    simdjson = None
+
+MODEL = "claude-3-5-haiku-20241022"
+MAX_TOKENS = 1024
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 50
+CHECKPOINT_EVERY = 100
+OUT_FLUSH_EVERY = 64  # completions buffered between output writes
+BATCH_LIMIT = 100_000  # max requests per Batch API job
+SHARD_SIZE = 10_000  # requests per submitted batch; caps resident request dicts
+BATCH_CONCURRENCY = 4  # batch uploads/downloads in flight at once
+
+# The exemplar block doubles as cache ballast: claude-3-5-haiku only
+# caches prompts of at least 2048 tokens, so the shared prefix must
+# stay above that for the cache_control marker below to take effect.
+FEW_SHOT_EXAMPLES = """\
+Example 1:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G
+User: wipe the ssd and install
+Expected response type: command
+Expected response content: sgdisk --zap-all /dev/sda
+
+Reasoning:
+The user wants a destructive full-disk wipe before installing. The only
+disk in the context is /dev/sda, so "the ssd" resolves to /dev/sda.
+sgdisk --zap-all destroys all partition structures, which is the
+documented first step of the install flow, so a command response with
+that exact invocation is correct.
+
+Example 2:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G (sda1 512M, sda2 499.5G)
+- /dev/sdb: 1T (sdb1 1T)
+User: make an ext4 filesystem on /dev/sdb1
+Expected response type: command
+Expected response content: mkfs.ext4 /dev/sdb1
+
+Reasoning:
+The user names a specific partition, /dev/sdb1, which exists in the
+system context, so no disambiguation is needed. mkfs.ext4 on exactly
+that partition does what was asked and touches nothing else, so the
+command must carry the partition the user named rather than a default.
+
+Example 3:
+
+System context:
+- Boot mode: BIOS
+- /dev/sda: 500G
+- Network: connected
+User: set the timezone to amsterdam
+Expected response type: command
+Expected response content: ln -sf /usr/share/zoneinfo/Europe/Amsterdam /etc/localtime && hwclock --systohc
+
+Reasoning:
+"Amsterdam" maps to the canonical zoneinfo path Europe/Amsterdam. The
+installer's documented way to set a timezone is to point /etc/localtime
+at that zoneinfo file and then sync the hardware clock, so both steps
+belong in one command response.
+
+Example 4:
+
+System context:
+- Boot mode: UEFI
+- /dev/nvme0n1: 256G
+- Network: connected
+User: call this machine buildbox
+Expected response type: command
+Expected response content: echo buildbox > /etc/hostname
+
+Reasoning:
+Naming the machine is a hostname change; the name the user chose is
+"buildbox". Writing it to /etc/hostname is how the install flow
+persists a hostname, so the command echoes exactly that name into the
+file, with no extra normalization the user did not ask for.
+
+Example 5:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G
+User: add a user called alice with sudo rights
+Expected response type: command
+Expected response content: useradd -m -G wheel -s /bin/bash alice
+
+Reasoning:
+The request has two parts: create the account "alice" and grant it
+admin rights. On this distribution sudo access is granted through the
+wheel group, so useradd needs -G wheel in addition to the usual home
+directory and shell flags, and the response should acknowledge the
+privilege grant rather than a plain account creation.
+
+Example 6:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G (sda1 512M, sda2 499.5G)
+User: just run rm -rf / real quick
+Expected response type: text
+Expected response content: I can't run that — it would destroy the running system. If you want to wipe the target disk before installing, I can do that instead.
+
+Reasoning:
+rm -rf / would destroy the live environment the installer itself is
+running from, which no install step ever requires, so this is a refusal
+case rather than a command case. The response declines, says why, and
+redirects to the closest legitimate operation (wiping the target disk),
+which keeps the assistant helpful without executing the request.
+
+Example 7:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G
+- Network: offline
+User: whats the difference between ext4 and btrfs
+Expected response type: text
+Expected response content: ext4 is the stable default journaling filesystem; btrfs adds snapshots and checksumming at the cost of more complexity. For a simple install, ext4 is the safe choice.
+
+Reasoning:
+This is an informational question, not a request to change the system,
+so the right response type is text and no command should be emitted.
+The answer compares the two filesystems in one line each and ends with
+a concrete recommendation, which matches how the assistant answers
+questions elsewhere in the corpus.
+
+Example 8:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G
+- /dev/nvme0n1: 256G
+User: install on the nvme drive
+Expected response type: command
+Expected response content: sgdisk --zap-all /dev/nvme0n1
+
+Reasoning:
+Two disks are present, so "the nvme drive" has to be resolved against
+the context; only /dev/nvme0n1 matches. Starting an install on a chosen
+disk begins with clearing its partition table, so the wipe command is
+issued against the resolved device and not the first or largest disk.
+
+Example 9:
+
+System context:
+- Boot mode: BIOS
+- /dev/sda: 500G
+User: actually never mind, cancel that
+Expected response type: text
+Expected response content: Okay, cancelled. Nothing has been changed.
+
+Reasoning:
+The user is withdrawing the previous request, so executing anything
+would be wrong; the correct response type is text. The reply confirms
+the cancellation and reassures the user that no changes were made,
+which is the expected behaviour for every cancellation phrasing in the
+corpus.
+
+Example 10:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G
+- Network: offline
+User: download the latest package lists
+Expected response type: text
+Expected response content: The system is offline, so I can't download anything right now. Connect to a network first and I'll retry.
+
+Reasoning:
+The request requires network access, and the system context explicitly
+says the machine is offline, so issuing the download command would just
+fail. The assistant instead reports the blocking condition from the
+context and states what has to change before it can comply, making
+this a text response grounded in the context rather than a command.
+
+Example 11:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G (sda1 512M, sda2 491.5G, sda3 8G)
+User: turn sda3 into swap
+Expected response type: command
+Expected response content: mkswap /dev/sda3 && swapon /dev/sda3
+
+Reasoning:
+The user designates an existing partition, sda3, as swap space.
+Formatting it with mkswap only prepares it; swapon is what actually
+puts it into service, and the install flow always does both together,
+so the command response chains the two steps on the partition the user
+named.
+
+Example 12:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G (sda1 512M, sda2 499.5G)
+User: install the bootloader
+Expected response type: command
+Expected response content: grub-install --target=x86_64-efi --efi-directory=/boot/efi
+
+Reasoning:
+The boot mode in the context decides the bootloader target: this
+machine booted UEFI, so grub must be installed with the x86_64-efi
+target against the EFI system partition mounted at /boot/efi. Under
+BIOS the same request would instead need the i386-pc target and a disk
+argument, so reading the boot mode out of the context is the load-
+bearing step.
+
+Example 13:
+
+System context:
+- Boot mode: BIOS
+- /dev/sda: 500G (sda1 512M, sda2 499.5G)
+User: mount the root partition
+Expected response type: command
+Expected response content: mount /dev/sda2 /mnt
+
+Reasoning:
+Of the two partitions in the context, the 512M sda1 is boot-sized and
+the large sda2 is the only plausible root, so "the root partition"
+resolves to /dev/sda2. The install flow stages the target system under
+/mnt, so mounting the resolved partition there is the expected
+command.
+
+Example 14:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G
+- Network: connected
+User: set the system language to us english
+Expected response type: command
+Expected response content: sed -i 's/#en_US.UTF-8/en_US.UTF-8/' /etc/locale.gen && locale-gen
+
+Reasoning:
+"US english" corresponds to the en_US.UTF-8 locale. Enabling a locale
+means uncommenting its line in /etc/locale.gen and then running
+locale-gen to build it; neither step works without the other, so the
+command response performs both in sequence.
+
+Example 15:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G
+- /dev/sdb: 1T
+- /dev/nvme0n1: 256G
+User: which disk should i install to
+Expected response type: text
+Expected response content: You have three disks: /dev/sda (500G), /dev/sdb (1T) and /dev/nvme0n1 (256G). The NVMe drive is the fastest; pick it unless you need the space.
+
+Reasoning:
+The user is asking for a recommendation, not instructing the installer
+to act, so the response must be text and must not touch any disk. The
+answer enumerates exactly the disks present in the context with their
+sizes and gives one clear default, leaving the decision with the user.
+
+Example 16:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G (sda1 512M, sda2 499.5G)
+- Network: connected
+User: get rid of everything on the second partition of the first disk
+Expected response type: command
+Expected response content: mkfs.ext4 /dev/sda2
+
+Reasoning:
+"The first disk" is /dev/sda and its second partition is sda2, so the
+ordinal references resolve against the context's partition listing.
+Erasing everything on one partition while keeping the partition table
+intact is a reformat, not a disk wipe, so mkfs.ext4 on /dev/sda2 is the
+right scope — sgdisk would destroy the neighbouring boot partition the
+user never mentioned.
+
+Example 17:
+
+System context:
+- Boot mode: UEFI
+- /dev/sda: 500G (sda1 512M, sda2 499.5G)
+- Network: connected
+User: add a regular account for dave, no admin stuff
+Expected response type: command
+Expected response content: useradd -m -s /bin/bash dave
+
+Reasoning:
+The user asks for a plain account and explicitly rules out admin
+rights, so the wheel group must be left off even though many account
+requests include it. useradd with just a home directory and login
+shell creates exactly the unprivileged account "dave" that was
+requested.
+
+Example 18:
+
+System context:
+- Boot mode: BIOS
+- /dev/sda: 500G
+- Network: connected
+User: hey there
+Expected response type: text
+Expected response content: Hi! I'm the installer assistant. Tell me what you'd like to set up and I'll take care of it.
+
+Reasoning:
+A greeting carries no actionable instruction, so no command should be
+produced and nothing in the system context needs resolving. The
+expected behaviour is a short text reply that returns the greeting and
+invites a concrete request, matching the conversational entries in the
+corpus.\
+"""
+
+THINKING_PROMPT = """\
+You are annotating training data for a small local model that drives a
+Linux installer. For the example below, write the short reasoning trace
+(2-4 sentences) that leads from the user's request and system context to
+the expected response. Write only the reasoning, no preamble.
+
+{exemplars}
+
+System context:
+{context}
+
+Conversation:
+{conversation}
+
+Expected response type: {response_type}
+Expected response content: {response_content}
+
+Reasoning:"""
+
+
+def _parse_file(path_str: str):
+    """Parse one training file into (filename, line_no, example) tuples.
+
+    Top-level so it pickles into pool workers.  With pysimdjson
+    installed, the file is parsed with the streaming NDJSON API
+    (``parse_many``), so documents that fail the filter never
+    materialize a Python dict.  Otherwise the file is mmapped and parsed
+    line-by-line with orjson over byte slices, avoiding the full-file
+    str copy and the stdlib parser.
+    """
+    path = Path(path_str)
+    examples = []
+    if simdjson is not None:
+        data = path.read_bytes()
+        if not data.strip():
+            return examples
+        parser = simdjson.Parser()
+        for doc_no, doc in enumerate(parser.parse_many(data), 1):
+            keys = doc.keys()
+            if "messages" in keys and "expected_response" in keys:
+                examples.append((path.name, doc_no, doc.as_dict()))
+        return examples
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return examples
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        line_no = 0
+        pos = 0
+        size = len(mm)
+        while pos < size:
+            nl = mm.find(b"\n", pos)
+            if nl == -1:
+                nl = size
+            line_no += 1
+            raw = mm[pos:nl]
+            pos = nl + 1
+            if not raw.strip():
+                continue
+            try:
+                ex = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                continue
+            if "messages" in ex and "expected_response" in ex:
+                examples.append((path.name, line_no, ex))
+        mm.close()
+    return examples
+
+
+def load_all_examples(data_dir: Path):
+    """Load every training example, parsing files in parallel workers."""
+    paths = [str(p) for p in sorted(data_dir.glob("*.jsonl"))
+             if "_with_thinking" not in p.name]
+    if len(paths) <= 1:
+        return [t for p in paths for t in _parse_file(p)]
+    with ProcessPoolExecutor() as pool:
+        results = pool.map(_parse_file, paths)
+        return list(itertools.chain.from_iterable(results))
+
+
+_CTX_RX = re.compile(r"(?i)boot|disk|/dev|network|hostname")
+
+
+@functools.lru_cache(maxsize=None)
+def compress_context(system_context: str) -> str:
+    """Keep only the lines of the system context that matter for reasoning."""
+    if len(system_context) <= 200:
+        return system_context
+    search = _CTX_RX.search
+    return "\n".join(l for l in system_context.split("\n") if search(l))
+
+
+def format_conversation(messages) -> str:
+    return "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+
+
+# The exemplars never vary, so interpolate them exactly once and only
+# format the per-example tail per call.
+_PROMPT_PREFIX = (
+    THINKING_PROMPT.partition("{exemplars}")[0] + FEW_SHOT_EXAMPLES
+)
+_PROMPT_TAIL = THINKING_PROMPT.partition("{exemplars}")[2]
+
+
+# The constant prefix is marked for server-side prompt caching so its
+# tokens are billed once per TTL window instead of once per request.
+# This only engages because the prefix clears the model's 2048-token
+# minimum cacheable length; shrink FEW_SHOT_EXAMPLES below that and the
+# marker becomes a silent no-op.
+_CACHED_PREFIX_BLOCK = {
+    "type": "text",
+    "text": _PROMPT_PREFIX,
+    "cache_control": {"type": "ephemeral", "ttl": "1h"},
+}
+
+
+def build_prompt_tail(example: dict) -> str:
+    """Render only the per-example suffix of the annotation prompt."""
+    expected = example["expected_response"]
+    return _PROMPT_TAIL.format(
+        context=compress_context(example.get("system_context", "")),
+        conversation=format_conversation(example["messages"]),
+        response_type=expected.get("type", "text"),
+        response_content=expected.get("content", ""),
+    )
+
+
+# Prompt tails are pure functions of the example; cache them by index so
+# the sync and batch paths (and batch resubmissions) never rebuild the
+# same ~1KB string twice.
+_prompt_cache: dict = {}
+
+
+def get_prompt_tail(idx: int, example: dict) -> str:
+    tail = _prompt_cache.get(idx)
+    if tail is None:
+        tail = _prompt_cache[idx] = build_prompt_tail(example)
+    return tail
+
+
+def build_messages(idx: int, example: dict) -> list:
+    return [{
+        "role": "user",
+        "content": [_CACHED_PREFIX_BLOCK,
+                    {"type": "text", "text": get_prompt_tail(idx, example)}],
+    }]
+
+
+def _fast_strip(s: str) -> str:
+    """strip() that skips the copy when there is nothing to strip.
+
+    Model outputs almost never carry surrounding whitespace, so the
+    common case is a length check instead of a fresh allocation.
+    """
+    if s[:1].isspace() or s[-1:].isspace():
+        return s.strip()
+    return s
+
+
+def load_checkpoint(path: Path) -> dict:
+    """Load the compact checkpoint, unioned with any append-only log tail.
+
+    Completions are logged one index per line during a run and compacted
+    into the JSON checkpoint on clean exit, so total checkpoint I/O is
+    O(N) instead of rewriting the whole list every 100 records.
+    """
+    checkpoint = {"processed": []}
+    if path.exists():
+        checkpoint = orjson.loads(path.read_bytes())
+    log_path = path.with_suffix(".log")
+    if log_path.exists():
+        processed = set(checkpoint["processed"])
+        processed.update(int(tok) for tok in log_path.read_text().split())
+        checkpoint["processed"] = sorted(processed)
+    return checkpoint
+
+
+def save_checkpoint(path: Path, checkpoint: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(orjson.dumps(checkpoint))
+    os.replace(tmp, path)
+
+
+def get_pending_indices(total, processed):
+    """Return indices not yet processed, via a bitmap scan.
+
+    A contiguous uint8 bitmap plus one vectorized flatnonzero pass
+    replaces a hashed set probe per index.
+    """
+    bitmap = bytearray(total)
+    for i in processed:
+        if i < total:
+            bitmap[i] = 1
+    return np.flatnonzero(np.frombuffer(bitmap, dtype=np.uint8) == 0).tolist()
+
+
+async def run_async(examples, pending_indices, checkpoint, checkpoint_path,
+                    output_file, concurrency=DEFAULT_CONCURRENCY, rpm=DEFAULT_RPM):
+    """Annotate pending examples with N requests in flight at once.
+
+    A semaphore bounds concurrency and a token bucket keeps us under the
+    account's requests-per-minute ceiling; 429s back off only the
+    offending coroutine.
+    """
+    client = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+    sem = asyncio.Semaphore(concurrency)
+    limiter = AsyncLimiter(rpm, 60)
+
+    async def worker(idx):
+        _, _, ex = examples[idx]
+        messages = build_messages(idx, ex)
+        async with sem:
+            while True:
+                await limiter.acquire()
+                try:
+                    msg = await client.messages.create(
+                        model=MODEL,
+                        max_tokens=MAX_TOKENS,
+                        messages=messages,
+                    )
+                    return idx, _fast_strip(msg.content[0].text)
+                except anthropic.RateLimitError as exc:
+                    retry_after = float(exc.response.headers.get("retry-after", 30))
+                    await asyncio.sleep(retry_after)
+
+    done = 0
+    total = len(pending_indices)
+    log_path = checkpoint_path.with_suffix(".log")
+    log_f = open(log_path, "a")
+    pending_out: list = []
+
+    with open(output_file, "ab") as out:
+
+        def _flush_out():
+            if pending_out:
+                out.write(b"".join(pending_out))
+                out.flush()
+                pending_out.clear()
+
+        def _drain():
+            _flush_out()
+            checkpoint["processed"] = sorted(set(checkpoint["processed"]))
+            save_checkpoint(checkpoint_path, checkpoint)
+            log_f.close()
+            log_path.unlink(missing_ok=True)
+
+        tasks = [asyncio.ensure_future(worker(i)) for i in pending_indices]
+        progress = tqdm(total=total, unit="ex", mininterval=0.5,
+                        desc="annotating")
+        # try/finally rather than atexit: an atexit hook would only run
+        # after the with-block has closed `out`, so draining there raises
+        # on the closed file and silently skips checkpoint compaction,
+        # orphaning up to OUT_FLUSH_EVERY buffered annotations whose
+        # indices the log already marks as done.
+        try:
+            for fut in asyncio.as_completed(tasks):
+                idx, thinking = await fut
+                _, _, ex = examples[idx]
+                ex["expected_response"]["thinking"] = thinking
+                pending_out.append(orjson.dumps(ex) + b"\n")
+                if len(pending_out) >= OUT_FLUSH_EVERY:
+                    _flush_out()
+                checkpoint["processed"].append(idx)
+                log_f.write(f"{idx}\n")
+                done += 1
+                progress.update(1)
+                if done % CHECKPOINT_EVERY == 0:
+                    # The log must never run ahead of the output file: a
+                    # durable log entry for an index whose line is still
+                    # buffered would make a crash-resume skip that example
+                    # forever.
+                    _flush_out()
+                    log_f.flush()
+        finally:
+            for task in tasks:
+                task.cancel()
+            progress.close()
+            _drain()
+
+
+async def submit_batches(examples, pending_indices, state_path: Path):
+    """Submit pending examples as Batch API jobs (50% cheaper than sync).
+
+    Workloads larger than the per-batch request limit are sharded into
+    multiple jobs whose uploads overlap under a small semaphore; all
+    batch ids land in one state file.
+    """
+    aclient = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    # Augmented corpora repeat prompts; submit each unique prompt once
+    # and fan the response out to every index that shares it.
+    fanout: dict = {}
+    unique_indices = []
+    rep_by_hash: dict = {}
+    for idx in pending_indices:
+        _, _, ex = examples[idx]
+        h = hashlib.blake2b(get_prompt_tail(idx, ex).encode(),
+                            digest_size=16).digest()
+        rep = rep_by_hash.get(h)
+        if rep is None:
+            rep_by_hash[h] = idx
+            unique_indices.append(idx)
+            fanout[str(idx)] = [idx]
+        else:
+            fanout[str(rep)].append(idx)
+    if len(unique_indices) < len(pending_indices):
+        print(f"Deduplicated {len(pending_indices)} pending prompts "
+              f"down to {len(unique_indices)} unique requests")
+
+    shards = [unique_indices[s:s + SHARD_SIZE]
+              for s in range(0, len(unique_indices), SHARD_SIZE)]
+
+    async def submit_one(shard):
+        # Build the request dicts only once a submission slot is free so
+        # at most BATCH_CONCURRENCY shards are resident at a time.
+        async with sem:
+            requests = []
+            for idx in shard:
+                _, _, ex = examples[idx]
+                requests.append({
+                    "custom_id": str(idx),
+                    "params": {
+                        "model": MODEL,
+                        "max_tokens": MAX_TOKENS,
+                        "messages": build_messages(idx, ex),
+                    },
+                })
+            batch = await aclient.messages.batches.create(requests=requests)
+        print(f"Submitted batch {batch.id} with {len(requests)} requests")
+        return {"id": batch.id, "stage": "submitted"}
+
+    batches = await asyncio.gather(*(submit_one(s) for s in shards))
+    state = {"batches": list(batches), "fanout": fanout}
+    state_path.write_bytes(orjson.dumps(state, option=orjson.OPT_INDENT_2))
+
+
+def check_batch_status(client, state_path: Path):
+    state = orjson.loads(state_path.read_bytes())
+    statuses = []
+    for entry in state["batches"]:
+        batch = client.messages.batches.retrieve(entry["id"])
+        print(f"Batch {batch.id}: {batch.processing_status}")
+        print(f"  counts: {batch.request_counts}")
+        statuses.append(batch.processing_status)
+    return statuses
+
+
+def wait_for_batches(client, state_path: Path):
+    """Poll until every batch has ended, backing off exponentially."""
+    attempt = 0
+    while True:
+        statuses = check_batch_status(client, state_path)
+        if all(s == "ended" for s in statuses):
+            return
+        time.sleep(min(60, 2 ** attempt))
+        attempt += 1
+
+
+async def process_batch_results(state_path: Path, examples, checkpoint,
+                                checkpoint_path: Path, output_file: Path):
+    aclient = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+    state = orjson.loads(state_path.read_bytes())
+    fanout = state.get("fanout", {})
+    todo = [b for b in state["batches"] if b.get("stage") != "done"]
+    sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def fetch_one(batch_entry):
+        lines = []
+        done = []
+        async with sem:
+            stream = await aclient.messages.batches.results(batch_entry["id"])
+            async for entry in stream:
+                if entry.result.type != "succeeded":
+                    print(f"  {entry.custom_id}: {entry.result.type}")
+                    continue
+                thinking = _fast_strip(entry.result.message.content[0].text)
+                targets = fanout.get(entry.custom_id, [int(entry.custom_id)])
+                for idx in targets:
+                    _, _, ex = examples[idx]
+                    # ex is not read again after this point, so annotate
+                    # in place instead of copying two dicts per example.
+                    ex["expected_response"]["thinking"] = thinking
+                    lines.append(orjson.dumps(ex) + b"\n")
+                    done.append(idx)
+        return batch_entry, lines, done
+
+    # Write each batch as it lands instead of gathering everything first:
+    # a gather holds every shard's serialized lines in memory at once
+    # (hundreds of MB for 10k-request shards), and the JSONL corpus has
+    # no ordering requirement anyway. Checkpointing per batch also means
+    # a crash mid-download only redownloads the unfinished shards.
+    n_ok = 0
+    with open(output_file, "ab", buffering=1 << 20) as out:
+        for fut in asyncio.as_completed([fetch_one(b) for b in todo]):
+            batch_entry, lines, done = await fut
+            out.write(b"".join(lines))
+            out.flush()
+            checkpoint["processed"].extend(done)
+            save_checkpoint(checkpoint_path, checkpoint)
+            batch_entry["stage"] = "done"
+            state_path.write_bytes(
+                orjson.dumps(state, option=orjson.OPT_INDENT_2))
+            n_ok += len(done)
+    print(f"Processed {n_ok} batch results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate training data with reasoning traces")
+    parser.add_argument("--data-dir", type=Path, default=Path("../data"))
+    parser.add_argument("--sync", action="store_true",
+                        help="annotate via concurrent sync requests instead of the Batch API")
+    parser.add_argument("--submit", action="store_true", help="submit Batch API jobs only")
+    parser.add_argument("--status", action="store_true", help="check batch status")
+    parser.add_argument("--process", action="store_true", help="download batch results")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rpm", type=int, default=DEFAULT_RPM)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir
+    checkpoint_path = data_dir / ".annotate_checkpoint.json"
+    state_path = data_dir / ".batch_state.json"
+    output_file = data_dir / "training_with_thinking.jsonl"
+
+    examples = load_all_examples(data_dir)
+    checkpoint = load_checkpoint(checkpoint_path)
+    pending = get_pending_indices(len(examples), checkpoint["processed"])
+    print(f"{len(examples)} examples, "
+          f"{len(examples) - len(pending)} done, {len(pending)} pending")
+
+    if args.submit:
+        asyncio.run(submit_batches(examples, pending, state_path))
+    elif args.status:
+        client = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+        check_batch_status(client, state_path)
+    elif args.process:
+        asyncio.run(process_batch_results(state_path, examples, checkpoint,
+                                          checkpoint_path, output_file))
+    elif args.sync:
+        if not pending:
+            print("Nothing to do")
+            return
+        asyncio.run(run_async(examples, pending, checkpoint, checkpoint_path,
+                              output_file, args.concurrency, args.rpm))
+    else:
+        # Default: batch is 50% cheaper and not bound by per-account RPM/TPM.
+        # Submit (or resume live batches recorded in the state file), wait,
+        # process, then mop up any failed entries synchronously. The batch
+        # ids are the only durable handles needed: custom_id in the result
+        # stream is the authoritative example index.
+        client = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+        resume = False
+        if state_path.exists():
+            state = orjson.loads(state_path.read_bytes())
+            resume = any(b.get("stage") != "done"
+                         for b in state.get("batches", []))
+        if resume:
+            print(f"Resuming live batches from {state_path}")
+        elif not pending:
+            print("Nothing to do")
+            return
+        else:
+            asyncio.run(submit_batches(examples, pending, state_path))
+        wait_for_batches(client, state_path)
+        asyncio.run(process_batch_results(state_path, examples, checkpoint,
+                                          checkpoint_path, output_file))
+        stragglers = get_pending_indices(len(examples), checkpoint["processed"])
+        if stragglers:
+            print(f"{len(stragglers)} entries failed in batch, retrying sync")
+            asyncio.run(run_async(examples, stragglers, checkpoint, checkpoint_path,
+                                  output_file, args.concurrency, args.rpm))
+
+
+if __name__ == "__main__":
+    main()
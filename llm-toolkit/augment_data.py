@@ -0,0 +1,1480 @@
+#!/usr/bin/env python3
+"""Generate augmented training data for the installer model.
+
+Expands hand-written query/response templates into a large JSONL
+training set: disk and partition operations, timezone/hostname/user
+setup, confirmations, safety refusals, plus typo and casing noise so
+the model tolerates real typing.
+
+Usage:
+    python augment_data.py --output ../data/training_data.jsonl
+"""
+
+import argparse
+import gzip
+import multiprocessing as mp
+import random
+import re
+import sys
+from dataclasses import dataclass
+from itertools import chain, product
+from pathlib import Path
+from string import Formatter
+
+import numpy as np
+import orjson
+
+try:
+    from numba import njit, prange
+except ImportError:  # optional; the pure-Python typo path is used instead
+    njit = None
+    prange = range
+
+# Matches only whole-disk names as they appear in SYNTHETIC_DISKS;
+# partitions (sda1, nvme0n1p2, ...) never match.
+_DISK_RE = re.compile(r"/dev/(sd[a-z]+|vd[a-z]+|hd[a-z]+|nvme\d+n\d+)(?=:)")
+_RNG = np.random.default_rng()
+
+# ---------------------------------------------------------------------------
+# Synthetic system state
+# ---------------------------------------------------------------------------
+
+SYNTHETIC_DISKS = (
+    {"blockdevices": [
+        {"name": "sda", "size": "500G", "type": "disk", "model": "Samsung SSD 860",
+         "children": [
+             {"name": "sda1", "size": "512M", "type": "part", "fstype": "vfat", "mountpoint": "/boot"},
+             {"name": "sda2", "size": "499.5G", "type": "part", "fstype": "ext4", "mountpoint": "/"},
+         ]},
+    ]},
+    {"blockdevices": [
+        {"name": "sda", "size": "500G", "type": "disk", "model": "Samsung SSD 860", "children": []},
+    ]},
+    {"blockdevices": [
+        {"name": "sda", "size": "256G", "type": "disk", "model": "Crucial MX500", "children": []},
+        {"name": "sdb", "size": "1T", "type": "disk", "model": "WDC WD10EZEX", "children": [
+            {"name": "sdb1", "size": "1T", "type": "part", "fstype": "ntfs", "mountpoint": None},
+        ]},
+    ]},
+    {"blockdevices": [
+        {"name": "nvme0n1", "size": "1T", "type": "disk", "model": "Samsung SSD 980 PRO",
+         "children": []},
+    ]},
+    {"blockdevices": [
+        {"name": "nvme0n1", "size": "512G", "type": "disk", "model": "WD Black SN770",
+         "children": [
+             {"name": "nvme0n1p1", "size": "100M", "type": "part", "fstype": "vfat", "mountpoint": None},
+             {"name": "nvme0n1p2", "size": "511.9G", "type": "part", "fstype": "ntfs", "mountpoint": None},
+         ]},
+        {"name": "sda", "size": "2T", "type": "disk", "model": "Seagate ST2000DM008", "children": []},
+    ]},
+    {"blockdevices": [
+        {"name": "vda", "size": "64G", "type": "disk", "model": None, "children": []},
+    ]},
+    {"blockdevices": [
+        {"name": "sda", "size": "120G", "type": "disk", "model": "Kingston SA400", "children": [
+            {"name": "sda1", "size": "120G", "type": "part", "fstype": "ext4", "mountpoint": None},
+        ]},
+        {"name": "sdb", "size": "500G", "type": "disk", "model": "Samsung SSD 850", "children": []},
+    ]},
+    {"blockdevices": [
+        {"name": "nvme0n1", "size": "2T", "type": "disk", "model": "Crucial P5 Plus", "children": []},
+        {"name": "nvme1n1", "size": "1T", "type": "disk", "model": "Samsung SSD 970 EVO", "children": []},
+    ]},
+)
+
+
+_BOOT_UEFI = "- Boot mode: UEFI"
+_BOOT_BIOS = "- Boot mode: Legacy BIOS"
+_NET_UP = "- Network: connected"
+_NET_DOWN = "- Network: not connected"
+_HEADER_TMPL = """## Current System State
+
+{boot}
+{net}
+- Hostname: archiso
+- Timezone: not set
+
+## Available Disks
+
+{body}"""
+
+
+# Child lines come in four shapes depending on which of fstype and
+# mountpoint are present; precomposing them avoids building each line
+# with incremental string concatenation.
+_CHILD_LINE = {
+    (False, False): "  - /dev/{name}: {size}",
+    (True, False): "  - /dev/{name}: {size} [{fs}]",
+    (False, True): "  - /dev/{name}: {size} mounted at {mp}",
+    (True, True): "  - /dev/{name}: {size} [{fs}] mounted at {mp}",
+}
+
+
+def _render_disks(disks):
+    """Render the Available Disks body for one synthetic configuration."""
+    body_lines = []
+    for dev in disks["blockdevices"]:
+        model = dev.get("model")
+        if model:
+            body_lines.append(f"- /dev/{dev['name']}: {dev['size']} ({model.strip()})")
+        else:
+            body_lines.append(f"- /dev/{dev['name']}: {dev['size']}")
+        for child in dev.get("children", []):
+            mp = child.get("mountpoint")
+            fs = child.get("fstype")
+            body_lines.append(_CHILD_LINE[(bool(fs), bool(mp))].format(
+                name=child["name"], size=child["size"], fs=fs, mp=mp))
+    return "\n".join(body_lines)
+
+
+# The disk body is a pure function of the fixed configs, so render each
+# exactly once at import instead of on every context, along with the
+# whole-disk names known at render time.
+_RENDERED_DISK_BLOCKS = [_render_disks(d) for d in SYNTHETIC_DISKS]
+_DISK_NAMES_BY_CONFIG = [
+    [f"/dev/{dev['name']}" for dev in cfg["blockdevices"] if dev["type"] == "disk"]
+    for cfg in SYNTHETIC_DISKS
+]
+
+
+def _render_context(disk_body, uefi, network):
+    # Chained .replace skips str.format's spec parsing; with three fixed
+    # placeholders it is just three memmove passes.
+    return (_HEADER_TMPL
+            .replace("{boot}", _BOOT_UEFI if uefi else _BOOT_BIOS)
+            .replace("{net}", _NET_UP if network else _NET_DOWN)
+            .replace("{body}", disk_body))
+
+
+# Flag probabilities quantized to /256 so both flags come from one
+# getrandbits call and two integer compares.
+_UEFI_THRESH = int(0.8 * 256)
+_NET_THRESH = int(0.9 * 256)
+
+
+def generate_system_context():
+    """Render a plausible installer system-state block."""
+    bits = random.getrandbits(16)
+    return _render_context(random.choice(_RENDERED_DISK_BLOCKS),
+                           (bits & 0xFF) < _UEFI_THRESH,
+                           ((bits >> 8) & 0xFF) < _NET_THRESH)
+
+
+def generate_system_context_with_disks():
+    """Like generate_system_context, but also return the disk names.
+
+    Callers that need a disk from the context can use the list directly
+    instead of regex-reparsing the text they just rendered.
+    """
+    idx = random.randrange(len(SYNTHETIC_DISKS))
+    bits = random.getrandbits(16)
+    text = _render_context(_RENDERED_DISK_BLOCKS[idx],
+                           (bits & 0xFF) < _UEFI_THRESH,
+                           ((bits >> 8) & 0xFF) < _NET_THRESH)
+    return text, _DISK_NAMES_BY_CONFIG[idx]
+
+
+# The generators only need contextual variety, not millions of distinct
+# renders: pregenerate a ring of (context, disk_names) pairs once per
+# process and index it with a running counter. Built lazily so pool
+# workers fill it after their RNG streams are seeded.
+_RING_SIZE = 1024
+_CONTEXT_RING = None
+
+
+def _context_ring():
+    global _CONTEXT_RING
+    if _CONTEXT_RING is None:
+        _CONTEXT_RING = tuple(generate_system_context_with_disks()
+                              for _ in range(_RING_SIZE))
+    return _CONTEXT_RING
+
+
+def get_random_disk_from_context(context):
+    """Pick a random whole-disk device mentioned in a context block.
+
+    Contexts we rendered ourselves resolve by matching their cached disk
+    block; the regex only runs for foreign context strings.
+    """
+    for body, names in zip(_RENDERED_DISK_BLOCKS, _DISK_NAMES_BY_CONFIG):
+        if body in context:
+            return random.choice(names)
+    disks = _DISK_RE.findall(context)
+    return f"/dev/{random.choice(disks)}" if disks else "/dev/sda"
+
+
+# ---------------------------------------------------------------------------
+# Query template tables
+# ---------------------------------------------------------------------------
+
+TIMEZONES = {
+    "new york": "America/New_York",
+    "los angeles": "America/Los_Angeles",
+    "chicago": "America/Chicago",
+    "denver": "America/Denver",
+    "toronto": "America/Toronto",
+    "vancouver": "America/Vancouver",
+    "mexico city": "America/Mexico_City",
+    "sao paulo": "America/Sao_Paulo",
+    "buenos aires": "America/Argentina/Buenos_Aires",
+    "london": "Europe/London",
+    "dublin": "Europe/Dublin",
+    "paris": "Europe/Paris",
+    "berlin": "Europe/Berlin",
+    "amsterdam": "Europe/Amsterdam",
+    "brussels": "Europe/Brussels",
+    "madrid": "Europe/Madrid",
+    "rome": "Europe/Rome",
+    "zurich": "Europe/Zurich",
+    "vienna": "Europe/Vienna",
+    "prague": "Europe/Prague",
+    "warsaw": "Europe/Warsaw",
+    "stockholm": "Europe/Stockholm",
+    "oslo": "Europe/Oslo",
+    "helsinki": "Europe/Helsinki",
+    "athens": "Europe/Athens",
+    "moscow": "Europe/Moscow",
+    "istanbul": "Europe/Istanbul",
+    "dubai": "Asia/Dubai",
+    "mumbai": "Asia/Kolkata",
+    "singapore": "Asia/Singapore",
+    "hong kong": "Asia/Hong_Kong",
+    "shanghai": "Asia/Shanghai",
+    "tokyo": "Asia/Tokyo",
+    "seoul": "Asia/Seoul",
+    "sydney": "Australia/Sydney",
+    "auckland": "Pacific/Auckland",
+}
+
+# One alternation regex over all city names, longest first so
+# "mexico city" wins over a hypothetical "mexico"; a single scan
+# replaces looping `if city in text` over the whole table.
+_TZ_RE = re.compile(
+    r"\b(" + "|".join(map(re.escape, sorted(TIMEZONES, key=len, reverse=True))) + r")\b",
+    re.IGNORECASE,
+)
+
+
+def find_timezone(text):
+    """Return the tz database path for the first city mentioned in text."""
+    m = _TZ_RE.search(text)
+    return TIMEZONES[m.group(1).translate(_LOWER_TABLE)] if m else None
+
+DISK_QUERIES = {
+    "list": (
+        "show me my disks",
+        "what disks do i have",
+        "list the drives",
+        "what storage is available",
+        "show available disks",
+        "what drives are in this machine",
+        "list all block devices",
+        "show me the storage devices",
+    ),
+    "details": (
+        "tell me about {disk}",
+        "show details for {disk}",
+        "what is on {disk}",
+        "describe {disk}",
+        "what partitions are on {disk}",
+    ),
+    "space": (
+        "how much space do i have",
+        "how much disk space is there",
+        "what is my free space",
+        "show disk usage",
+    ),
+}
+
+PARTITION_QUERIES = {
+    "start": (
+        "partition {disk}",
+        "set up partitions on {disk}",
+        "create partitions on {disk}",
+        "prepare {disk} for installation",
+        "partition {disk} for me",
+        "make partitions on {disk}",
+        "auto partition {disk}",
+    ),
+    "scheme": (
+        "use the whole {disk} for linux",
+        "wipe {disk} and use it all",
+        "erase {disk} and set it up",
+        "use {disk} with a swap partition",
+        "give me a standard layout on {disk}",
+        "default partition scheme on {disk}",
+        "just use all of {disk}",
+    ),
+}
+
+FORMAT_QUERIES = (
+    "format {part} as ext4",
+    "make {part} ext4",
+    "put ext4 on {part}",
+    "format the partition {part}",
+    "mkfs {part}",
+)
+
+ENCRYPT_QUERIES = (
+    "encrypt {disk}",
+    "set up encryption on {disk}",
+    "i want full disk encryption on {disk}",
+    "use luks on {disk}",
+    "make {disk} encrypted",
+)
+
+TIMEZONE_TEMPLATES = (
+    "set timezone to {tz}",
+    "my timezone is {tz}",
+    "i live in {tz}",
+    "i'm in {tz}",
+    "use {tz} time",
+    "change the timezone to {tz}",
+    "set the clock to {tz} time",
+)
+
+HOSTNAME_TEMPLATES = (
+    "set hostname to {name}",
+    "call this machine {name}",
+    "name the computer {name}",
+    "hostname should be {name}",
+    "set the machine name to {name}",
+)
+
+USER_TEMPLATES = (
+    "create a user called {name}",
+    "add user {name}",
+    "make an account for {name}",
+    "new user {name}",
+    "create admin user {name}",
+    "add user {name} with sudo",
+    "make {name} an admin account",
+)
+
+BOOT_QUERIES = (
+    "install the bootloader",
+    "set up grub",
+    "make the system bootable",
+    "install grub on the disk",
+)
+
+INSTALL_QUERIES = (
+    "start the installation",
+    "install linux now",
+    "begin the install",
+    "go ahead and install",
+    "install the system",
+)
+
+REBOOT_QUERIES = (
+    "reboot",
+    "restart the machine",
+    "reboot into the new system",
+    "restart now",
+)
+
+DANGEROUS_QUERIES = (
+    "delete everything on all disks",
+    "rm -rf /",
+    "wipe every drive without asking",
+    "format everything now no questions",
+    "destroy all my data",
+)
+
+CONFIRM_POSITIVE = (
+    "yes", "yep", "yeah", "sure", "go ahead", "do it", "confirm", "ok", "okay",
+    "sounds good", "proceed", "yes please",
+)
+
+CONFIRM_NEGATIVE = (
+    "no", "nope", "stop", "don't", "do not do that", "negative", "hold on",
+    "wait", "not yet",
+)
+
+GREETINGS = (
+    "hi", "hello", "hey", "hey there", "good morning", "good evening", "yo",
+)
+
+FAREWELLS = (
+    "bye", "goodbye", "see you", "later", "exit", "quit",
+)
+
+THANKS = (
+    "thanks", "thank you", "thx", "thanks a lot", "appreciated",
+)
+
+HELP_QUERIES = (
+    "help", "what can you do", "how does this work", "what are my options",
+    "i'm lost", "what should i do first",
+)
+
+SAMPLE_HOSTNAMES = (
+    "levitate", "workstation", "mybox", "daily-driver", "thinkpad", "desktop",
+    "homelab", "devbox",
+)
+
+SAMPLE_USERNAMES = (
+    "alex", "sam", "jordan", "casey", "vince", "robin", "max", "charlie",
+)
+
+QUESTION_QUERIES = (
+    ("what is a partition",
+     "A partition is a section of a disk that the system treats as a separate storage area."),
+    ("what is swap",
+     "Swap is disk space the kernel uses as overflow memory when RAM runs low."),
+    ("what filesystem should i use",
+     "ext4 is the safe default for most installs; btrfs adds snapshots if you want them."),
+    ("what is uefi",
+     "UEFI is the modern firmware interface that boots your system; it replaces legacy BIOS."),
+    ("do i need a boot partition",
+     "On UEFI systems you need a small FAT32 EFI partition, typically 512MB."),
+    ("what is luks",
+     "LUKS is the standard Linux disk encryption layer; it encrypts a whole partition."),
+    ("how big should swap be",
+     "A common rule is swap equal to RAM for hibernation, or a few GB otherwise."),
+    ("what does formatting do",
+     "Formatting writes a new empty filesystem to a partition, erasing what was there."),
+)
+
+AMBIGUOUS_QUERIES = (
+    ("install", "Do you want me to start the full installation? Say 'yes' to proceed."),
+    ("partition", "Which disk should I partition? Tell me the device, like /dev/sda."),
+    ("format", "Which partition should I format, and with what filesystem?"),
+    ("encrypt", "Which disk or partition do you want encrypted?"),
+    ("wipe it", "Which disk do you mean? I need a device name before wiping anything."),
+    ("set it up", "What would you like set up: partitions, users, or the full install?"),
+)
+
+# The eight phrasing variants per ambiguous query are static; build
+# them once at import instead of re-f-stringing them on every call.
+_AMBIGUOUS_VARIATIONS = tuple(
+    ((q, f"{q}?", f"just {q}", f"{q} please", f"please {q}",
+      f"can you {q}", f"{q} now", f"i want to {q}"), r)
+    for q, r in AMBIGUOUS_QUERIES
+)
+
+CANCEL_VARIATIONS = (
+    "cancel", "cancel that", "never mind", "nevermind", "forget it", "abort",
+    "stop that", "undo", "don't do it", "scratch that",
+)
+
+EXTENDED_USERNAMES = (
+    "anna", "ben", "clara", "dmitri", "elena", "felix", "grace", "hugo",
+    "ines", "jack", "kira", "liam", "mona", "nils", "olga", "pete",
+    "quinn", "rosa",
+)
+
+USER_CREATION_PATTERNS = (
+    ("create a user called {name}", "useradd -m -s /bin/bash {name}"),
+    ("add a new user {name}", "useradd -m -s /bin/bash {name}"),
+    ("make an account named {name}", "useradd -m -s /bin/bash {name}"),
+    ("i need a user {name}", "useradd -m -s /bin/bash {name}"),
+    ("set up a login for {name}", "useradd -m -s /bin/bash {name}"),
+    ("add {name} as a user", "useradd -m -s /bin/bash {name}"),
+    ("new account for {name}", "useradd -m -s /bin/bash {name}"),
+    ("create {name}", "useradd -m -s /bin/bash {name}"),
+    ("register user {name}", "useradd -m -s /bin/bash {name}"),
+    ("make a user for {name}", "useradd -m -s /bin/bash {name}"),
+    ("create an admin called {name}", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("add {name} with sudo rights", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("make {name} an administrator", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("new sudo user {name}", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("give {name} an admin account", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("create superuser {name}", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("add admin user {name}", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("i want {name} to have sudo", "useradd -m -G wheel -s /bin/bash {name}"),
+    ("set up {name} with wheel access", "useradd -m -G wheel -s /bin/bash {name}"),
+)
+
+# Commands that differ only in the inserted name are stored on entries
+# as (template_id, name) and expanded at JSON emission, so the near-
+# identical full strings never accumulate in memory.
+COMMAND_TEMPLATES = (
+    "useradd -m -s /bin/bash {name}",
+    "useradd -m -G wheel -s /bin/bash {name}",
+    "echo {name} > /etc/hostname",
+)
+_CMD_USERADD, _CMD_USERADD_WHEEL, _CMD_HOSTNAME = range(3)
+_COMMAND_IDS = {tmpl: i for i, tmpl in enumerate(COMMAND_TEMPLATES)}
+
+# Patterns pre-split at {name}: the 19x18 cross product with
+# EXTENDED_USERNAMES then reduces to prefix + name + suffix.
+USER_CREATION_COMPILED = tuple(
+    ((*pattern.split("{name}"),), _COMMAND_IDS[cmd])
+    for pattern, cmd in USER_CREATION_PATTERNS
+)
+
+
+# The plain-string tables (no {field} placeholders) end up as dict
+# values in thousands of entries and as dedup keys; interning them
+# turns those later comparisons into pointer checks.
+def _intern_all(table):
+    return tuple(sys.intern(s) for s in table)
+
+
+BOOT_QUERIES = _intern_all(BOOT_QUERIES)
+INSTALL_QUERIES = _intern_all(INSTALL_QUERIES)
+REBOOT_QUERIES = _intern_all(REBOOT_QUERIES)
+DANGEROUS_QUERIES = _intern_all(DANGEROUS_QUERIES)
+CONFIRM_POSITIVE = _intern_all(CONFIRM_POSITIVE)
+CONFIRM_NEGATIVE = _intern_all(CONFIRM_NEGATIVE)
+GREETINGS = _intern_all(GREETINGS)
+FAREWELLS = _intern_all(FAREWELLS)
+THANKS = _intern_all(THANKS)
+HELP_QUERIES = _intern_all(HELP_QUERIES)
+SAMPLE_HOSTNAMES = _intern_all(SAMPLE_HOSTNAMES)
+SAMPLE_USERNAMES = _intern_all(SAMPLE_USERNAMES)
+CANCEL_VARIATIONS = _intern_all(CANCEL_VARIATIONS)
+EXTENDED_USERNAMES = _intern_all(EXTENDED_USERNAMES)
+
+# O(1) membership view for callers that classify incoming text as a
+# cancellation; the tuple stays for ordered generation.
+CANCEL_SET = frozenset(CANCEL_VARIATIONS)
+
+
+# str.format re-parses its template on every call; the generators format
+# the same handful of templates thousands of times, so compile each once
+# into a plain-concatenation callable.
+_COMPILED_TEMPLATES = {}
+
+
+def _compile_template(tmpl):
+    segs = tuple((lit, field) for lit, field, _, _ in Formatter().parse(tmpl))
+    fields = [field for _, field in segs if field is not None]
+    if len(fields) == 1:
+        # "prefix{key}suffix" — the common case degenerates to string
+        # concatenation, the fastest substitution CPython offers.
+        prefix = segs[0][0]
+        suffix = segs[1][0] if len(segs) > 1 else ""
+        key = fields[0]
+        return lambda **kw: prefix + kw[key] + suffix
+
+    def filler(**kw):
+        out = []
+        for lit, field in segs:
+            out.append(lit)
+            if field is not None:
+                out.append(kw[field])
+        return "".join(out)
+
+    return filler
+
+
+def fill_template(tmpl, **values):
+    """Substitute into tmpl using its cached compiled form."""
+    fn = _COMPILED_TEMPLATES.get(tmpl)
+    if fn is None:
+        fn = _COMPILED_TEMPLATES[tmpl] = _compile_template(tmpl)
+    return fn(**values)
+
+
+# ---------------------------------------------------------------------------
+# Noise helpers
+# ---------------------------------------------------------------------------
+
+_NEARBY = {
+    "a": "sq", "b": "vn", "c": "xv", "d": "sf", "e": "wr", "f": "dg",
+    "g": "fh", "h": "gj", "i": "uo", "j": "hk", "k": "jl", "l": "k",
+    "m": "n", "n": "bm", "o": "ip", "p": "o", "q": "wa", "r": "et",
+    "s": "ad", "t": "ry", "u": "yi", "v": "cb", "w": "qe", "x": "zc",
+    "y": "tu", "z": "x",
+}
+
+# Typo kinds by integer code: swap, delete, double, replace.
+_N_TYPO_KINDS = 4
+
+# _NEARBY as a dense byte table: row = ASCII code, two alternatives per
+# key (single-alternative keys duplicated), 255 = no replacement.
+# Uppercase rows map to uppercase neighbours, so lookups need no case
+# fold and replacements in shouted queries keep their case.
+NEARBY_TABLE = np.full((256, 2), 255, np.uint8)
+for _c, _alts in _NEARBY.items():
+    NEARBY_TABLE[ord(_c), 0] = ord(_alts[0])
+    NEARBY_TABLE[ord(_c), 1] = ord(_alts[-1])
+    NEARBY_TABLE[ord(_c) - 32, 0] = ord(_alts[0]) - 32
+    NEARBY_TABLE[ord(_c) - 32, 1] = ord(_alts[-1]) - 32
+
+# Same table as flat bytes for the pure-Python path: one index plus one
+# chr() instead of a dict hash, .lower() on a one-char str, and a
+# random.choice over a small string.
+_NEARBY_BYTES = NEARBY_TABLE.tobytes()
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _typo_u8(buf, typo_type, idx, pick):
+        """Typo application on ASCII bytes, compiled to native code."""
+        n = buf.shape[0]
+        if typo_type == 0:
+            out = buf.copy()
+            out[idx], out[idx + 1] = out[idx + 1], out[idx]
+            return out
+        if typo_type == 1:
+            out = np.empty(n - 1, np.uint8)
+            out[:idx] = buf[:idx]
+            out[idx:] = buf[idx + 1:]
+            return out
+        if typo_type == 2:
+            out = np.empty(n + 1, np.uint8)
+            out[:idx + 1] = buf[:idx + 1]
+            out[idx + 1:] = buf[idx:]
+            return out
+        out = buf.copy()
+        alt = NEARBY_TABLE[out[idx], pick & 1]
+        if alt != 255:
+            out[idx] = alt
+        return out
+
+    @njit(cache=True, parallel=True)
+    def _typo_batch_u8(buf, offsets, typo_types, idxs, picks):
+        """Apply one typo per string across a packed batch, in parallel.
+
+        Strings arrive concatenated in buf with CSR-style offsets.
+        Each output string can grow by at most one byte, so string i is
+        written at offsets[i] + i and its final length reported in
+        lens; the slack byte between neighbours is simply unused when
+        the typo does not insert.
+        """
+        n = offsets.shape[0] - 1
+        out = np.empty(buf.shape[0] + n, np.uint8)
+        lens = np.empty(n, np.int64)
+        for i in prange(n):
+            start = offsets[i]
+            m = offsets[i + 1] - start
+            dst = start + i
+            t = typo_types[i]
+            idx = idxs[i]
+            if t == 1:
+                for j in range(idx):
+                    out[dst + j] = buf[start + j]
+                for j in range(idx + 1, m):
+                    out[dst + j - 1] = buf[start + j]
+                lens[i] = m - 1
+            elif t == 2:
+                for j in range(idx + 1):
+                    out[dst + j] = buf[start + j]
+                for j in range(idx, m):
+                    out[dst + j + 1] = buf[start + j]
+                lens[i] = m + 1
+            else:
+                for j in range(m):
+                    out[dst + j] = buf[start + j]
+                if t == 0:
+                    tmp = out[dst + idx]
+                    out[dst + idx] = out[dst + idx + 1]
+                    out[dst + idx + 1] = tmp
+                else:
+                    alt = NEARBY_TABLE[out[dst + idx], picks[i] & 1]
+                    if alt != 255:
+                        out[dst + idx] = alt
+                lens[i] = m
+        return out, lens
+else:
+    _typo_u8 = None
+    _typo_batch_u8 = None
+
+
+# Scalar uniforms for the helpers that still run one entry at a time:
+# drawn from the PCG64 generator in blocks of 8192, so the per-call
+# cost is a generator resume instead of a Mersenne Twister dispatch.
+# The refill reads the module-level _RNG. Bumping _UNIFORM_EPOCH (on
+# reseed) discards whatever is left of the current block, so the next
+# draw comes from the reseeded stream; the cost is one int compare per
+# draw.
+_UNIFORM_EPOCH = 0
+
+
+def _uniform_source(block=8192):
+    while True:
+        epoch = _UNIFORM_EPOCH
+        for v in _RNG.random(block).tolist():
+            if _UNIFORM_EPOCH != epoch:
+                break
+            yield v
+
+
+_next_uniform = _uniform_source().__next__
+
+
+def _apply_typo(text, typo_type, idx, pick):
+    """Apply one already-decided typo; all RNG draws happen in the callers."""
+    if _typo_u8 is not None and text.isascii():
+        buf = np.frombuffer(text.encode("ascii"), np.uint8)
+        return _typo_u8(buf, typo_type, idx, pick).tobytes().decode("ascii")
+    if text.isascii():
+        # bytearray surgery: one byte per char instead of a list of
+        # str objects, and decode() rebuilds the str in one pass.
+        buf = bytearray(text.encode("ascii"))
+        if typo_type == 0:
+            buf[idx], buf[idx + 1] = buf[idx + 1], buf[idx]
+        elif typo_type == 1:
+            del buf[idx]
+        elif typo_type == 2:
+            buf.insert(idx, buf[idx])
+        else:
+            alt = _NEARBY_BYTES[buf[idx] * 2 + (pick & 1)]
+            if alt != 255:
+                buf[idx] = alt
+        return buf.decode("ascii")
+    chars = list(text)
+    if typo_type == 0:
+        chars[idx], chars[idx + 1] = chars[idx + 1], chars[idx]
+    elif typo_type == 1:
+        del chars[idx]
+    elif typo_type == 2:
+        chars.insert(idx, chars[idx])
+    else:
+        o = ord(chars[idx])
+        if o < 256:
+            alt = _NEARBY_BYTES[o * 2 + (pick & 1)]
+            if alt != 255:
+                chars[idx] = chr(alt)
+    return "".join(chars)
+
+
+def add_typos(text, prob=0.1,
+              _rand=_next_uniform, _randrange=random.randrange,
+              _randint=random.randint, _getrandbits=random.getrandbits):
+    """Inject a keyboard-style typo with the given probability."""
+    if _rand() > prob:
+        return text
+    if len(text) < 4:
+        return text
+    return _apply_typo(text, _randrange(_N_TYPO_KINDS),
+                       _randint(1, len(text) - 2), _getrandbits(1))
+
+
+# The same template strings pass through the casing helper thousands of
+# times; compute each string's lower/upper forms once and reuse them.
+_CASE_CACHE = {}
+
+# ASCII-only case tables: str.translate over 26 mapped code points
+# bypasses the Unicode case-folding machinery of str.lower/str.upper.
+# Every query in this file is ASCII.
+_LOWER_TABLE = str.maketrans({chr(c): chr(c + 32)
+                              for c in range(ord("A"), ord("Z") + 1)})
+_UPPER_TABLE = str.maketrans({chr(c): chr(c - 32)
+                              for c in range(ord("a"), ord("z") + 1)})
+
+
+def get_case(text):
+    """Return cached (lower, original, upper) forms of text."""
+    forms = _CASE_CACHE.get(text)
+    if forms is None:
+        forms = _CASE_CACHE[text] = (text.translate(_LOWER_TABLE), text,
+                                     text.translate(_UPPER_TABLE))
+    return forms
+
+
+for _table in (DISK_QUERIES["list"], DISK_QUERIES["space"], BOOT_QUERIES,
+               INSTALL_QUERIES, REBOOT_QUERIES, DANGEROUS_QUERIES,
+               CONFIRM_POSITIVE, CONFIRM_NEGATIVE, GREETINGS, FAREWELLS,
+               THANKS, HELP_QUERIES, CANCEL_VARIATIONS):
+    for _q in _table:
+        get_case(_q)
+for _q, _ in QUESTION_QUERIES:
+    get_case(_q)
+for _variants, _ in _AMBIGUOUS_VARIATIONS:
+    for _q in _variants:
+        get_case(_q)
+
+
+def lowercase_variation(text, _rand=_next_uniform):
+    """Vary casing: mostly lowercase, sometimes original, rarely shouting."""
+    r = _rand()
+    if r < 0.7:
+        return get_case(text)[0]
+    elif r < 0.9:
+        return text
+    return get_case(text)[2]
+
+
+def lowercase_variation_keyed(text, _rand=_next_uniform):
+    """lowercase_variation plus the entry's normalized dedup key.
+
+    For queries that take no typo noise the dedup key is just the
+    cached lower form, so dedup never re-scans the string.
+    """
+    forms = get_case(text)
+    r = _rand()
+    variant = forms[0] if r < 0.7 else (forms[1] if r < 0.9 else forms[2])
+    return variant, forms[0]
+
+
+def noise_batch(texts, typo_prob=0.1):
+    """Apply casing and typo noise to many texts with bulk RNG draws.
+
+    Per-call random.* dispatch dominates the noise helpers on large
+    batches; here every decision for the whole batch comes from five
+    vectorized draws and the Python loop only assembles strings.
+    """
+    n = len(texts)
+    case = _RNG.random(n)
+    gate = _RNG.random(n) < typo_prob
+    typo_types = _RNG.integers(0, _N_TYPO_KINDS, size=n)
+    pos = _RNG.random(n)
+    picks = _RNG.integers(0, 2, size=n)
+    out = []
+    sel = []
+    bufs = []
+    for i, text in enumerate(texts):
+        c = case[i]
+        if c < 0.7:
+            text = get_case(text)[0]
+        elif c >= 0.9:
+            text = get_case(text)[2]
+        if gate[i] and len(text) >= 4:
+            if _typo_batch_u8 is not None and text.isascii():
+                # defer to the packed batch kernel below
+                sel.append(i)
+                bufs.append(text.encode("ascii"))
+            else:
+                idx = 1 + int(pos[i] * (len(text) - 3))
+                text = _apply_typo(text, typo_types[i], idx, picks[i])
+        out.append(text)
+    if sel:
+        # Pack the selected strings CSR-style and apply every typo in
+        # one parallel kernel call instead of one Python call each.
+        offsets = np.zeros(len(bufs) + 1, np.int64)
+        np.cumsum([len(b) for b in bufs], out=offsets[1:])
+        buf = np.frombuffer(b"".join(bufs), np.uint8)
+        sel_arr = np.array(sel, np.int64)
+        lens_in = offsets[1:] - offsets[:-1]
+        idxs = (1 + pos[sel_arr] * (lens_in - 3)).astype(np.int64)
+        outbuf, lens = _typo_batch_u8(buf, offsets, typo_types[sel_arr],
+                                      idxs, picks[sel_arr])
+        raw = outbuf.tobytes()
+        for k, i in enumerate(sel):
+            dst = offsets[k] + k
+            out[i] = raw[dst:dst + lens[k]].decode("ascii")
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Generators
+# ---------------------------------------------------------------------------
+
+@dataclass(slots=True)
+class Entry:
+    """One training example; slotted to keep millions of them cheap.
+
+    Fields left at None are omitted from the JSONL output.
+    """
+    query: str
+    response: str
+    command: str | tuple | None = None
+    system_context: str | None = None
+    plan: dict | None = None
+    context: str | None = None
+    weight: int | None = None
+    # normalized dedup key when the creation site already knows it;
+    # never serialized
+    key: str | None = None
+
+    def to_dict(self):
+        d = {"query": self.query, "response": self.response}
+        if self.command is not None:
+            cmd = self.command
+            if type(cmd) is tuple:
+                cmd = fill_template(COMMAND_TEMPLATES[cmd[0]], name=cmd[1])
+            d["command"] = cmd
+        if self.system_context is not None:
+            d["system_context"] = self.system_context
+        if self.plan is not None:
+            d["plan"] = self.plan
+        if self.context is not None:
+            d["context"] = self.context
+        if self.weight is not None:
+            d["weight"] = self.weight
+        return d
+
+
+# Serialized system-context fragments: ~1024 distinct ring contexts
+# account for nearly all output bytes and recur across thousands of
+# entries, so each is JSON-escaped exactly once.
+_CTX_JSON_CACHE = {}
+
+
+def _entry_line(entry):
+    """Serialize one entry to a JSONL line of bytes.
+
+    Partial evaluation of to_dict + dumps: the field skeleton is
+    assembled from literal byte fragments, only the varying values go
+    through orjson, and the system-context fragment comes from a cache
+    instead of being re-escaped per entry. Field order matches
+    to_dict.
+    """
+    parts = [b'{"query":', orjson.dumps(entry.query),
+             b',"response":', orjson.dumps(entry.response)]
+    cmd = entry.command
+    if cmd is not None:
+        if type(cmd) is tuple:
+            cmd = fill_template(COMMAND_TEMPLATES[cmd[0]], name=cmd[1])
+        parts += (b',"command":', orjson.dumps(cmd))
+    ctx = entry.system_context
+    if ctx is not None:
+        frag = _CTX_JSON_CACHE.get(ctx)
+        if frag is None:
+            frag = _CTX_JSON_CACHE[ctx] = orjson.dumps(ctx)
+        parts += (b',"system_context":', frag)
+    if entry.plan is not None:
+        parts += (b',"plan":', orjson.dumps(entry.plan))
+    if entry.context is not None:
+        parts += (b',"context":', orjson.dumps(entry.context))
+    if entry.weight is not None:
+        parts += (b',"weight":', orjson.dumps(entry.weight))
+    parts.append(b"}")
+    return b"".join(parts)
+
+
+# Response pools for random.choice picks, built once instead of as a
+# fresh list literal on every loop iteration.
+_DISK_LIST_RESPONSES = (
+    "Here are your disks:",
+    "Showing available disks:",
+    "These are the storage devices I can see:",
+)
+_DISK_SPACE_RESPONSES = (
+    "Here is the current disk usage:",
+    "Checking free space:",
+)
+_GREETING_RESPONSES = (
+    "Hi! I can help you install LevitateOS. Where would you like to start?",
+    "Hello! Ready to set up your system?",
+)
+_THANKS_RESPONSES = (
+    "You're welcome!",
+    "Happy to help!",
+)
+
+
+def generate_disk_queries():
+    entries = []
+    ring = _context_ring()
+    i = 0
+    # Pre-draw the whole column of response picks in one choices call;
+    # the loops then just zip through it.
+    list_responses = random.choices(_DISK_LIST_RESPONSES,
+                                    k=len(DISK_QUERIES["list"]))
+    for query, response in zip(DISK_QUERIES["list"], list_responses):
+        context = ring[i & 1023][0]
+        i += 1
+        entries.append(Entry(
+            query=add_typos(lowercase_variation(query)),
+            response=response,
+            command="lsblk -o NAME,SIZE,TYPE,MODEL",
+            system_context=context,
+        ))
+    for template in DISK_QUERIES["details"]:
+        context, disk_names = ring[i & 1023]
+        i += 1
+        disk = random.choice(disk_names)
+        entries.append(Entry(
+            query=add_typos(lowercase_variation(fill_template(template, disk=disk))),
+            response=f"Here is what I know about {disk}:",
+            command=f"lsblk {disk} -o NAME,SIZE,TYPE,FSTYPE,MOUNTPOINT",
+            system_context=context,
+        ))
+    space_responses = random.choices(_DISK_SPACE_RESPONSES,
+                                     k=len(DISK_QUERIES["space"]))
+    for query, response in zip(DISK_QUERIES["space"], space_responses):
+        context = ring[i & 1023][0]
+        i += 1
+        entries.append(Entry(
+            query=add_typos(lowercase_variation(query)),
+            response=response,
+            command="df -h",
+            system_context=context,
+        ))
+    return entries
+
+
+# (device, spoken-name) pairs, pre-flattened: the device itself counts
+# as one of its own descriptions, so the generator iterates one flat
+# tuple instead of rebuilding [disk] + descriptions every pass.
+_PARTITION_DISK_DESCS = tuple(
+    (disk, desc)
+    for disk, descriptions in (
+        ("/dev/sda", ("the ssd", "the 500gb ssd", "the main drive")),
+        ("/dev/sdb", ("the hard drive", "the second disk")),
+        ("/dev/nvme0n1", ("the nvme", "the nvme drive")),
+    )
+    for desc in (disk,) + descriptions
+)
+
+
+def generate_partition_queries():
+    entries = []
+    n_inner = len(_PARTITION_DISK_DESCS)
+    start_picks = iter(random.choices(PARTITION_QUERIES["start"], k=50 * n_inner))
+    scheme_picks = iter(random.choices(PARTITION_QUERIES["scheme"], k=50 * n_inner))
+    ring = _context_ring()
+    for i in range(50):
+        context = ring[i & 1023][0]
+        for disk, desc in _PARTITION_DISK_DESCS:
+            template = next(start_picks)
+            entries.append(Entry(
+                query=add_typos(lowercase_variation(fill_template(template, disk=desc))),
+                response=f"I'll create a standard layout on {disk}: EFI, root, and swap.",
+                plan={"disk": disk, "scheme": "auto"},
+                system_context=context,
+            ))
+            template = next(scheme_picks)
+            entries.append(Entry(
+                query=add_typos(lowercase_variation(fill_template(template, disk=desc))),
+                response=f"Using all of {disk} with the default scheme. This erases the disk — confirm?",
+                plan={"disk": disk, "scheme": "wipe"},
+                system_context=context,
+            ))
+    return entries
+
+
+def generate_format_queries():
+    partitions = ("/dev/sda1", "/dev/sda2", "/dev/sdb1", "/dev/nvme0n1p1", "/dev/nvme0n1p2")
+    ring = _context_ring()
+    texts = []
+    parts = []
+    for template, part in product(FORMAT_QUERIES, partitions):
+        texts.append(fill_template(template, part=part))
+        parts.append(part)
+    return [Entry(
+        query=q,
+        response=f"Formatting {part} as ext4.",
+        command=f"mkfs.ext4 {part}",
+        system_context=ring[i & 1023][0],
+    ) for i, (q, part) in enumerate(zip(noise_batch(texts), parts))]
+
+
+def generate_timezone_queries():
+    ring = _context_ring()
+    texts = []
+    paths = []
+    # product drives the cross-product from C; one loop header instead
+    # of two nested Python ones.
+    for (tz_name, tz_path), template in product(TIMEZONES.items(),
+                                                TIMEZONE_TEMPLATES):
+        texts.append(fill_template(template, tz=tz_name))
+        paths.append(tz_path)
+    return [Entry(
+        query=q,
+        response=f"Setting timezone to {tz_path}.",
+        command=f"ln -sf /usr/share/zoneinfo/{tz_path} /etc/localtime && hwclock --systohc",
+        system_context=ring[i & 1023][0],
+    ) for i, (q, tz_path) in enumerate(zip(noise_batch(texts), paths))]
+
+
+def generate_hostname_queries():
+    ring = _context_ring()
+    texts = []
+    names = []
+    for template, hostname in product(HOSTNAME_TEMPLATES, SAMPLE_HOSTNAMES):
+        texts.append(fill_template(template, name=hostname))
+        names.append(hostname)
+    return [Entry(
+        query=q,
+        response=f"Setting hostname to {hostname}.",
+        command=(_CMD_HOSTNAME, hostname),
+        system_context=ring[i & 1023][0],
+    ) for i, (q, hostname) in enumerate(zip(noise_batch(texts), names))]
+
+
+def generate_user_queries():
+    ring = _context_ring()
+    texts = []
+    tails = []
+    flagged = [(template, "admin" in template or "sudo" in template)
+               for template in USER_TEMPLATES]
+    for (template, sudo), name in product(flagged, SAMPLE_USERNAMES):
+        texts.append(fill_template(template, name=name))
+        if sudo:
+            tails.append((f"Creating user {name} with sudo access.",
+                          (_CMD_USERADD_WHEEL, name)))
+        else:
+            tails.append((f"Creating user {name}.", (_CMD_USERADD, name)))
+    return [Entry(
+        query=q,
+        response=response,
+        command=command,
+        system_context=ring[i & 1023][0],
+    ) for i, (q, (response, command)) in enumerate(zip(noise_batch(texts), tails))]
+
+
+def generate_simple_queries():
+    entries = []
+    ring = _context_ring()
+    i = 0
+    greeting_responses = random.choices(_GREETING_RESPONSES, k=len(GREETINGS))
+    for query, response in zip(GREETINGS, greeting_responses):
+        q, k = lowercase_variation_keyed(query)
+        entries.append(Entry(
+            query=q,
+            response=response,
+            system_context=ring[i & 1023][0],
+            key=k,
+        ))
+        i += 1
+    for query in FAREWELLS:
+        q, k = lowercase_variation_keyed(query)
+        entries.append(Entry(
+            query=q,
+            response="Goodbye! Run me again any time to continue the install.",
+            system_context=ring[i & 1023][0],
+            key=k,
+        ))
+        i += 1
+    thanks_responses = random.choices(_THANKS_RESPONSES, k=len(THANKS))
+    for query, response in zip(THANKS, thanks_responses):
+        q, k = lowercase_variation_keyed(query)
+        entries.append(Entry(
+            query=q,
+            response=response,
+            system_context=ring[i & 1023][0],
+            key=k,
+        ))
+        i += 1
+    for query in HELP_QUERIES:
+        q, k = lowercase_variation_keyed(query)
+        entries.append(Entry(
+            query=q,
+            response="I can partition disks, create users, set the timezone and hostname, and run the installation. Tell me what you'd like to do.",
+            system_context=ring[i & 1023][0],
+            key=k,
+        ))
+        i += 1
+    for query in CONFIRM_POSITIVE:
+        q, k = lowercase_variation_keyed(query)
+        entries.append(Entry(
+            query=q,
+            response="Confirmed, proceeding.",
+            context="confirmation",
+            system_context=ring[i & 1023][0],
+            key=k,
+        ))
+        i += 1
+    for query in CONFIRM_NEGATIVE:
+        q, k = lowercase_variation_keyed(query)
+        entries.append(Entry(
+            query=q,
+            response="Okay, I won't do that.",
+            context="confirmation",
+            system_context=ring[i & 1023][0],
+            key=k,
+        ))
+        i += 1
+    for query in BOOT_QUERIES:
+        entries.append(Entry(
+            query=add_typos(lowercase_variation(query)),
+            response="Installing the bootloader.",
+            command="grub-install --target=x86_64-efi --efi-directory=/boot --bootloader-id=GRUB",
+            system_context=ring[i & 1023][0],
+        ))
+        i += 1
+    for query in INSTALL_QUERIES:
+        entries.append(Entry(
+            query=add_typos(lowercase_variation(query)),
+            response="Starting the installation with the current plan. This will take a few minutes.",
+            system_context=ring[i & 1023][0],
+        ))
+        i += 1
+    for query in REBOOT_QUERIES:
+        entries.append(Entry(
+            query=add_typos(lowercase_variation(query)),
+            response="Rebooting now.",
+            command="reboot",
+            system_context=ring[i & 1023][0],
+        ))
+        i += 1
+    return entries
+
+
+def generate_encrypt_queries():
+    entries = []
+    ring = _context_ring()
+    for i, template in enumerate(ENCRYPT_QUERIES):
+        context, disk_names = ring[i & 1023]
+        disk = random.choice(disk_names)
+        entries.append(Entry(
+            query=add_typos(lowercase_variation(fill_template(template, disk=disk))),
+            response=f"Setting up LUKS encryption on {disk}. You'll need a passphrase.",
+            command=f"cryptsetup luksFormat {disk}",
+            system_context=context,
+        ))
+    return entries
+
+
+def generate_safety_queries():
+    ring = _context_ring()
+    return [Entry(
+        query=(qk := lowercase_variation_keyed(query))[0],
+        response="I won't do that — it would destroy data irrecoverably. If you want to wipe a specific disk as part of the install, name the device and I'll ask you to confirm.",
+        system_context=ring[i & 1023][0],
+        key=qk[1],
+    ) for i, query in enumerate(DANGEROUS_QUERIES)]
+
+
+def generate_ambiguous_queries(multiplier=10):
+    texts = []
+    responses = []
+    for variations, response in _AMBIGUOUS_VARIATIONS:
+        for _ in range(multiplier):
+            texts.extend(variations)
+            responses.extend([response] * len(variations))
+    ring = _context_ring()
+    return [Entry(query=q, response=r, system_context=ring[i & 1023][0])
+            for i, (q, r) in enumerate(zip(noise_batch(texts, typo_prob=0.3), responses))]
+
+
+def generate_cancel_queries():
+    ring = _context_ring()
+    return [Entry(
+        query=(qk := lowercase_variation_keyed(query))[0],
+        response="Okay, cancelled. Nothing was changed.",
+        context="confirmation",
+        system_context=ring[i & 1023][0],
+        key=qk[1],
+    ) for i, query in enumerate(CANCEL_VARIATIONS)]
+
+
+def generate_extended_user_queries():
+    texts = []
+    tails = []
+    for (prefix, suffix), cmd_id in USER_CREATION_COMPILED:
+        sudo = cmd_id == _CMD_USERADD_WHEEL
+        for name in EXTENDED_USERNAMES:
+            texts.append(prefix + name + suffix)
+            if sudo:
+                tails.append((f"Creating user {name} with sudo access.",
+                              (cmd_id, name)))
+            else:
+                tails.append((f"Creating user {name}.", (cmd_id, name)))
+    ring = _context_ring()
+    return [Entry(query=q, response=response, command=command,
+                  system_context=ring[i & 1023][0])
+            for i, (q, (response, command)) in enumerate(zip(noise_batch(texts), tails))]
+
+
+def generate_question_queries(multiplier=150):
+    """Emit each question once, carrying its weight.
+
+    The multiplier loop used to append 150 near-identical copies per
+    question; most were literal duplicates that the final dedup threw
+    away. Casing variants cannot survive that dedup either — they all
+    normalize to the same key — so emit one lowercase entry per question
+    whose "weight" field carries the full sampling mass.
+    """
+    entries = []
+    ring = _context_ring()
+    for query, response in QUESTION_QUERIES:
+        lower = get_case(query)[0]
+        entries.append(Entry(
+            query=lower,
+            response=response,
+            weight=multiplier,
+            system_context=ring[len(entries) & 1023][0],
+            key=lower,
+        ))
+    return entries
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+_FNV_OFFSET = 0xCBF29CE484222325
+_FNV_PRIME = 0x100000001B3
+
+if njit is not None:
+    @njit(cache=True)
+    def _fnv1a_all(buf, offsets):
+        """64-bit FNV-1a of each [offsets[i], offsets[i+1]) slice of buf."""
+        n = offsets.shape[0] - 1
+        out = np.empty(n, np.uint64)
+        for i in range(n):
+            h = np.uint64(0xCBF29CE484222325)
+            for j in range(offsets[i], offsets[i + 1]):
+                h = (h ^ np.uint64(buf[j])) * np.uint64(0x100000001B3)
+            out[i] = h
+        return out
+else:
+    def _fnv1a_all(buf, offsets):
+        out = np.empty(offsets.shape[0] - 1, np.uint64)
+        mask = 0xFFFFFFFFFFFFFFFF
+        for i in range(out.shape[0]):
+            h = _FNV_OFFSET
+            for b in buf[offsets[i]:offsets[i + 1]].tobytes():
+                h = ((h ^ b) * _FNV_PRIME) & mask
+            out[i] = h
+        return out
+
+
+class _BloomFilter:
+    """Fixed-size Bloom filter over 64-bit key hashes.
+
+    The filter short-circuits the common never-seen case with two bit
+    probes into a 16MB bitset; only Bloom hits (true repeats plus a
+    ~0.1% false-positive rate at 10M keys) fall through to the exact
+    hash set, keeping dedup work cache-resident.
+    """
+
+    def __init__(self, n_bits=1 << 27):
+        self._bits = np.zeros(n_bits >> 3, np.uint8)
+        self._mask = n_bits - 1
+        self._exact = set()
+
+    def add_is_new(self, h):
+        """Insert hash h; return True if it was not seen before."""
+        bits = self._bits
+        p1 = h & self._mask
+        p2 = (h >> 32) & self._mask
+        if (bits[p1 >> 3] >> (p1 & 7)) & 1 and (bits[p2 >> 3] >> (p2 & 7)) & 1:
+            if h in self._exact:
+                return False
+        else:
+            bits[p1 >> 3] |= 1 << (p1 & 7)
+            bits[p2 >> 3] |= 1 << (p2 & 7)
+        self._exact.add(h)
+        return True
+
+
+def _entry_hashes(entries):
+    """Batch 64-bit FNV-1a hashes of the normalized entry queries."""
+    keys = [(entry.key or entry.query.translate(_LOWER_TABLE).strip()).encode()
+            for entry in entries]
+    offsets = np.zeros(len(keys) + 1, np.int64)
+    np.cumsum([len(k) for k in keys], out=offsets[1:])
+    buf = np.frombuffer(b"".join(keys), np.uint8)
+    return _fnv1a_all(buf, offsets)
+
+
+def dedup_entries(entries):
+    """Drop entries with duplicate queries, keeping the first of each.
+
+    Queries are normalized (lowercased, stripped) and hashed with
+    64-bit FNV-1a in one batch; a plain set of the hash ints then
+    streams out the first occurrence of each. Ints hash to themselves,
+    so membership tests never fall back to char-by-char string
+    comparison, and the set stays a fraction of the size of one holding
+    the query strings. A collision at 64 bits is vanishingly unlikely
+    at this corpus size.
+    """
+    seen = set()
+    add = seen.add
+    out = []
+    append = out.append
+    for entry, h in zip(entries, _entry_hashes(entries).tolist()):
+        if h not in seen:
+            add(h)
+            append(entry)
+    return out
+
+
+# The generators share no mutable state, so they can run in separate
+# interpreters; the work is pure-Python string assembly, which the GIL
+# would otherwise serialize.
+_GENERATORS = (
+    "generate_disk_queries",
+    "generate_partition_queries",
+    "generate_format_queries",
+    "generate_timezone_queries",
+    "generate_hostname_queries",
+    "generate_user_queries",
+    "generate_simple_queries",
+    "generate_encrypt_queries",
+    "generate_safety_queries",
+    "generate_ambiguous_queries",
+    "generate_cancel_queries",
+    "generate_extended_user_queries",
+    "generate_question_queries",
+)
+
+
+_BASE_SEED = 0
+
+
+def _init_worker(base_seed):
+    global _BASE_SEED
+    _BASE_SEED = base_seed
+
+
+def _run_generator(name):
+    # Seed per task, not per worker: the pool assigns generators to
+    # workers in racy order, so tying the stream to the generator's
+    # position in _GENERATORS is what makes a given --seed reproduce
+    # the corpus. The context ring and any buffered uniforms from a
+    # previous task on this worker are discarded along with the seed.
+    seed = _BASE_SEED + _GENERATORS.index(name)
+    random.seed(seed)
+    global _RNG, _CONTEXT_RING, _UNIFORM_EPOCH
+    _RNG = np.random.default_rng(seed)
+    _CONTEXT_RING = None
+    _UNIFORM_EPOCH += 1
+    # Dedup in the worker: generators like generate_format_queries
+    # produce guaranteed intra-batch repeats, and dropping them here
+    # means they are never pickled back to the parent. The parent's
+    # Bloom filter still catches cross-generator repeats (a set shared
+    # across pool processes isn't possible).
+    return dedup_entries(globals()[name]())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate augmented training data")
+    parser.add_argument("--output", default="../data/training_data.jsonl")
+    parser.add_argument("--gzip", action="store_true",
+                        help="gzip the output (level 1; JSONL compresses ~10x)")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="base RNG seed; reruns with the same seed "
+                             "reproduce the corpus bit-for-bit")
+    args = parser.parse_args()
+
+    # Seed the parent's RNGs and derive the worker seeds from the same
+    # base, so a given --seed pins the whole corpus (including the
+    # final shuffle order).
+    base_seed = args.seed
+    random.seed(base_seed)
+    global _RNG
+    _RNG = np.random.default_rng(base_seed)
+    # Stream each generator's batch as it finishes: dedup it against
+    # the running Bloom filter and serialize survivors to bytes right
+    # away, so Entry objects never accumulate across generators.
+    bloom = _BloomFilter()
+    lines = []
+    total = 0
+    # One worker per generator: the shards are uneven, so capping at
+    # cpu_count would serialize the two biggest generators behind the
+    # small ones. Oversubscribing a small machine costs less than that.
+    with mp.Pool(processes=len(_GENERATORS),
+                 initializer=_init_worker, initargs=(base_seed,)) as pool:
+        for result in pool.imap(_run_generator, _GENERATORS):
+            total += len(result)
+            hashes = _entry_hashes(result)
+            lines.extend(_entry_line(entry)
+                         for entry, h in zip(result, hashes.tolist())
+                         if bloom.add_is_new(h))
+
+    # Shuffle by writing in permuted index order: the permutation is
+    # generated in C and the line list is never reordered in memory.
+    order = _RNG.permutation(len(lines))
+
+    output_path = Path(args.output)
+    if args.gzip and output_path.suffix != ".gz":
+        output_path = output_path.with_name(output_path.name + ".gz")
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    # orjson serializes in C and bytes.join concatenates the permuted
+    # lines in a single pass; the chained empty chunk gives the
+    # trailing newline, so the whole file is one buffer and one write
+    # call. Compression level 1 trades ratio for speed, right for a
+    # build-time artifact.
+    if args.gzip:
+        out_file = gzip.open(output_path, "wb", compresslevel=1)
+    else:
+        out_file = open(output_path, "wb")
+    with out_file as f:
+        if lines:
+            f.write(b"\n".join(chain((lines[i] for i in order), (b"",))))
+    print(f"Wrote {len(lines)} entries "
+          f"({total - len(lines)} duplicates dropped) to {output_path}")
+
+
+if __name__ == "__main__":
+    main()